@@ -0,0 +1,337 @@
+# Load test for the monitor: a local HTTP stub farm stands in for the monitored services,
+# and in-memory fakes replace Telegram and MongoDB, so bot.py runs unmodified at scale.
+#
+#   python bench.py                          # 100, 1000 and 10000 targets
+#   python bench.py --sizes 5000 --hang-rate 0.01 --output bench_output.txt
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from itertools import count
+
+from aiohttp import web
+
+DEFAULT_SIZES = [100, 1000, 10000]
+
+# In-memory stand-ins for the Motor collections bot.py uses
+
+def matches(doc, query):
+    for key, value in (query or {}).items():
+        if isinstance(value, dict) and any(k.startswith("$") for k in value):
+            continue
+        if key.startswith("$") or doc.get(key) != value:
+            return False
+    return True
+
+def apply_update(doc, update):
+    for key, value in update.get("$set", {}).items():
+        doc[key] = value
+    for key, value in update.get("$setOnInsert", {}).items():
+        doc.setdefault(key, value)
+    for key, value in update.get("$inc", {}).items():
+        doc[key] = doc.get(key, 0) + value
+    for key in update.get("$unset", {}):
+        doc.pop(key, None)
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+class FakeCollection:
+    def __init__(self, name, docs=()):
+        self.name = name
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.ids = count(1)
+        self.writes = 0
+
+    def find(self, query=None, **kwargs):
+        return FakeCursor([d for d in self.docs.values() if matches(d, query)])
+
+    async def find_one(self, query=None):
+        return next((d for d in self.docs.values() if matches(d, query)), None)
+
+    async def count_documents(self, query):
+        return len(self.find(query).docs)
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", next(self.ids))
+        self.docs[doc["_id"]] = doc
+        self.writes += 1
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            await self.insert_one(doc)
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs[doc.get("_id", query.get("_id"))] = doc
+        self.writes += 1
+
+    async def update_one(self, query, update, upsert=False):
+        doc = await self.find_one(query)
+        if doc is None:
+            if not upsert:
+                return
+            doc = {k: v for k, v in query.items() if not k.startswith("$")}
+            await self.insert_one(doc)
+        apply_update(doc, update)
+        self.writes += 1
+
+    async def update_many(self, query, update, upsert=False):
+        for doc in self.find(query).docs:
+            apply_update(doc, update)
+        self.writes += 1
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        await self.update_one(query, update, upsert=upsert)
+        return await self.find_one({"_id": query["_id"]})
+
+    async def delete_one(self, query):
+        doc = await self.find_one(query)
+        if doc is not None:
+            del self.docs[doc["_id"]]
+        self.writes += 1
+
+    async def bulk_write(self, ops, ordered=True):
+        # Rollup upserts are only counted; their contents do not affect the measurements
+        self.writes += len(ops)
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+# Records dashboard edits instead of talking to Telegram
+
+class FakeClient:
+    def __init__(self, latency):
+        self.latency = latency
+        self.edits = []
+
+    async def edit_message_text(self, chat_id, message_id, text, parse_mode=None, reply_markup=None):
+        await asyncio.sleep(self.latency)
+        self.edits.append((chat_id, message_id, len(text)))
+
+class FakeUser:
+    id = 1
+
+class FakeCallbackQuery:
+    def __init__(self, data):
+        self.data = data
+        self.from_user = FakeUser()
+        self.text = None
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+    async def edit_message_text(self, text, reply_markup=None):
+        self.text = text
+
+# Local HTTP farm: every target gets its own loopback address so per-host limits behave as in production
+
+def target_url(port, i):
+    n = i + 1
+    return f"http://127.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}:{port}/t/{i}"
+
+def start_farm(args):
+    rng = random.Random(args.seed)
+    profiles = []
+    for _ in range(args.targets):
+        hangs = rng.random() < args.hang_rate
+        profiles.append((rng.lognormvariate(args.latency_mu, args.latency_sigma) / 1000, hangs))
+    errors = random.Random(args.seed + 1)
+    state = {"requests": 0, "peak_connections": 0}
+
+    async def handler(request):
+        latency, hangs = profiles[int(request.match_info["i"])]
+        state["requests"] += 1
+        if hangs:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(latency)
+        if errors.random() < args.error_rate:
+            return web.Response(status=503, text="unavailable")
+        return web.Response(text="ok")
+
+    server = web.Application()
+    server.router.add_get("/t/{i}", handler)
+    return server, state
+
+async def sample_connections(runner, state):
+    while True:
+        state["peak_connections"] = max(state["peak_connections"], len(runner.server.connections))
+        await asyncio.sleep(0.01)
+
+async def serve_farm(args, conn):
+    server, state = start_farm(args)
+    runner = web.AppRunner(server, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "0.0.0.0", 0)
+    await site.start()
+    sampler = asyncio.create_task(sample_connections(runner, state))
+    conn.send(runner.addresses[0][1])
+    loop = asyncio.get_running_loop()
+    while True:
+        command = await loop.run_in_executor(None, conn.recv)
+        if command == "reset":
+            state["peak_connections"] = 0
+            conn.send(None)
+        elif command == "peak":
+            conn.send(state["peak_connections"])
+        else:
+            break
+    sampler.cancel()
+    await runner.cleanup()
+
+def run_farm(args, conn):
+    # Separate process: with keep-alive, both ends of every probe connection would otherwise share one fd limit
+    asyncio.run(serve_farm(args, conn))
+
+def farm_call(conn, command):
+    conn.send(command)
+    return conn.recv()
+
+async def run_single(args):
+    # bot.py reads its settings at import time, so the environment is prepared first
+    os.environ.setdefault("HISTORY_FLUSH_INTERVAL", "0.5")
+    os.environ["TELEGRAM_EDITS_PER_MINUTE"] = str(args.edits_per_minute)
+    import bot
+
+    conn, farm_conn = multiprocessing.Pipe()
+    farm = multiprocessing.get_context("spawn").Process(target=run_farm, args=(args, farm_conn), daemon=True)
+    farm.start()
+    port = conn.recv()
+
+    message_ids = list(range(1000, 1000 + max(1, args.targets // args.targets_per_message)))
+    bot.bots_col = FakeCollection("bots", [
+        {"_id": f"t{i:06d}", "name": f"Service {i}", "url": target_url(port, i)} for i in range(args.targets)
+    ])
+    bot.config_col = FakeCollection("config", [{
+        "_id": "settings", "update_interval": 60, "channel_id": -100, "message_id": message_ids[0], "message_ids": message_ids
+    }])
+    bot.history_col = FakeCollection("history")
+    bot.rollups_col = FakeCollection("rollups")
+    fake = FakeClient(args.telegram_latency)
+    bot.app = fake
+
+    bot.probe_transport["session"] = bot.create_probe_session()
+    tasks = [
+        asyncio.create_task(bot.dashboard_writer()),
+        asyncio.create_task(bot.history_writer())
+    ]
+
+    cycles = []
+    edits = []
+    for _ in range(args.cycles):
+        farm_call(conn, "reset")
+        start = time.perf_counter()
+        await bot.refresh_results()
+        cycles.append(time.perf_counter() - start)
+        before = len(fake.edits)
+        bot.request_dashboard_refresh()
+        # Let the writer drain: it is done once no edit has landed for a while
+        while True:
+            seen = len(fake.edits)
+            await asyncio.sleep(max(0.5, args.telegram_latency * 5))
+            if len(fake.edits) == seen and not bot.dashboard["event"].is_set():
+                break
+        edits.append(len(fake.edits) - before)
+
+    start = time.perf_counter()
+    # Cold build: every card and JSON fragment is rendered, as after a restart
+    bot.status_cache["version"] = -1
+    bot.status_cache["built_at"] = 0
+    bot.status_cache["targets"] = {}
+    await bot.status_body("/")
+    status_render = time.perf_counter() - start
+    query = FakeCallbackQuery("manage_bots")
+    start = time.perf_counter()
+    await bot.manage_bots_callback(None, query)
+    manage_render = time.perf_counter() - start
+
+    for task in tasks:
+        task.cancel()
+    await bot.probe_transport["session"].close()
+    peak_connections = farm_call(conn, "peak")
+    conn.send("stop")
+    farm.join()
+
+    cycle = statistics.median(cycles)
+    return {
+        "targets": args.targets,
+        "cycle_s": round(cycle, 3),
+        "probes_per_s": round(args.targets / cycle, 1) if cycle else None,
+        "peak_sockets": peak_connections,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "telegram_calls_per_cycle": round(sum(edits) / len(edits), 1),
+        "status_page_ms": round(status_render * 1000, 1),
+        "manage_urls_ms": round(manage_render * 1000, 1),
+        "history_writes": bot.history_col.writes
+    }
+
+def format_table(rows):
+    columns = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(columns, widths))]
+    for row in rows:
+        lines.append("  ".join(str(row[c]).rjust(w) for c, w in zip(columns, widths)))
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the monitor against a local stub farm.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="target counts to run")
+    parser.add_argument("--cycles", type=int, default=3, help="full probe cycles per size")
+    parser.add_argument("--latency-mu", type=float, default=4.0, help="log-normal mu of stub latency in ms")
+    parser.add_argument("--latency-sigma", type=float, default=0.6, help="log-normal sigma of stub latency")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="fraction of requests answered with 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction of targets that never answer")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="seconds per fake Telegram edit")
+    parser.add_argument("--edits-per-minute", type=float, default=6000, help="Telegram edit budget given to the bot")
+    parser.add_argument("--targets-per-message", type=int, default=40, help="dashboard targets per channel message")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--targets", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.targets:
+        # Child process: one size per process so peak memory is measured in isolation
+        print(json.dumps(asyncio.run(run_single(args))))
+        return
+
+    forwarded = []
+    for name, value in vars(args).items():
+        if name not in ("sizes", "output", "targets"):
+            forwarded += [f"--{name.replace('_', '-')}", str(value)]
+    rows = []
+    for size in args.sizes:
+        child = [sys.executable, __file__, "--targets", str(size)] + forwarded
+        # stderr is left attached so a failing child shows its traceback
+        out = subprocess.run(child, check=True, stdout=subprocess.PIPE, text=True).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+        print(f"{size} targets done", file=sys.stderr)
+
+    report = format_table(rows)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+if __name__ == "__main__":
+    main()
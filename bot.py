@@ -1,13 +1,35 @@
 import asyncio
+import gzip
+import hashlib
+import json
+import heapq
+import math
+import random
+import socket
+import ssl
 import time
 import os
+import zlib
 import aiohttp
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from html import escape
+from bisect import bisect_left
+import dns.asyncresolver
+import dns.resolver
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import ThreadedResolver
+from itertools import islice
+from urllib.parse import urlsplit
 from datetime import datetime, timedelta, timezone
 from pyrogram import Client, idle, filters, enums
 import pyrogram
+from pyrogram.errors import FloodWait, MessageNotModified
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from aiohttp import web
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
 API_ID = os.environ.get("API_ID")
 API_HASH = os.environ.get("API_HASH")
@@ -23,13 +45,218 @@ db_client = AsyncIOMotorClient(MONGO_URL)
 db = db_client["monitor_bot"]
 bots_col = db["bots"]
 config_col = db["config"]
+history_col = db["history"]
+rollups_col = db["rollups"]
+leases_col = db["leases"]
+workers_col = db["workers"]
+results_col = db["results"]
+snapshots_col = db["snapshots"]
 
 app = Client("monitor", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
 
 # Temporary storage for user input
 user_data = {}
 
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Shared probe results, filled by updater() and read by every status surface
+STATUS_MAX_AGE = int(os.environ.get("STATUS_MAX_AGE", "120"))
+probe_results = {}
+probe_state = {"updated_at": 0, "task": None, "version": 0, "warm": False}
+
+# Last-known results persisted for warm restarts; SNAPSHOT_FILE switches from MongoDB to a local file
+SNAPSHOT_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", "30"))
+SNAPSHOT_FILE = os.environ.get("SNAPSHOT_FILE")
+
+# Status page and /api/status bodies, serialized and compressed once per change of the results
+STATUS_RENDER_INTERVAL = float(os.environ.get("STATUS_RENDER_INTERVAL", "1"))
+status_cache = {"version": -1, "built_at": 0, "bodies": {}, "targets": {}, "task": None}
+
+# Server-Sent Events: one pre-encoded delta per changed target, fanned out to every open status page
+SSE_MAX_CLIENTS = int(os.environ.get("SSE_MAX_CLIENTS", "5000"))
+SSE_QUEUE_SIZE = int(os.environ.get("SSE_QUEUE_SIZE", "256"))
+SSE_HEARTBEAT = int(os.environ.get("SSE_HEARTBEAT", "15"))
+live = {"subscribers": set(), "last": {}}
+
+# Probe engine limits: total sockets, sockets per host and wall-clock budget per cycle
+PROBE_CONCURRENCY = int(os.environ.get("PROBE_CONCURRENCY", "100"))
+PROBE_PER_HOST = int(os.environ.get("PROBE_PER_HOST", "4"))
+PROBE_CYCLE_DEADLINE = int(os.environ.get("PROBE_CYCLE_DEADLINE", "60"))
+probe_limits = {"global": None, "hosts": {}, "in_flight": 0}
+
+# Adaptive probe timeouts and hedging from each target's recent latencies, plus flap damping
+PROBE_TIMEOUT_MIN = float(os.environ.get("PROBE_TIMEOUT_MIN", "2"))
+PROBE_TIMEOUT_MAX = float(os.environ.get("PROBE_TIMEOUT_MAX", "30"))
+PROBE_TIMEOUT_FACTOR = float(os.environ.get("PROBE_TIMEOUT_FACTOR", "3"))
+HEDGE_MIN_DELAY = float(os.environ.get("HEDGE_MIN_DELAY", "0.2"))
+LATENCY_WINDOW = int(os.environ.get("LATENCY_WINDOW", "50"))
+FLAP_THRESHOLD = int(os.environ.get("FLAP_THRESHOLD", "2"))
+latencies = {}
+flaps = {}
+
+# Long-lived probe transport, opened and closed by main()
+PROBE_KEEPALIVE = int(os.environ.get("PROBE_KEEPALIVE", "0"))
+PROBE_MAX_IDLE_HOSTS = int(os.environ.get("PROBE_MAX_IDLE_HOSTS", "1000"))
+DNS_MIN_TTL = int(os.environ.get("DNS_MIN_TTL", "30"))
+DNS_MAX_TTL = int(os.environ.get("DNS_MAX_TTL", "3600"))
+DNS_LIFETIME = float(os.environ.get("DNS_LIFETIME", "2"))
+probe_transport = {"session": None}
+
+# Sharded probing: "standalone" probes everything here, "coordinator" and "worker" split the
+# targets by leased partitions, and only the coordinator runs Telegram and the web pages
+RUN_MODE = os.environ.get("RUN_MODE", "standalone")
+SHARDED = RUN_MODE != "standalone"
+WORKER_ID = os.environ.get("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+WEB_PORT = int(os.environ.get("PORT", "8080"))
+PARTITIONS = int(os.environ.get("PARTITIONS", "64"))
+LEASE_TTL = int(os.environ.get("LEASE_TTL", "30"))
+LEASE_MARGIN = float(os.environ.get("LEASE_MARGIN", "2"))
+RESULT_SYNC_INTERVAL = float(os.environ.get("RESULT_SYNC_INTERVAL", "2"))
+sharding = {"owned": set(), "valid_until": 0, "pending": {}}
+
+# Probe types selectable per target; bodies are never read past BODY_PREFIX_BYTES
+PROBE_TYPES = ["get", "head", "tcp", "dns"]
+BODY_PREFIX_BYTES = int(os.environ.get("BODY_PREFIX_BYTES", "65536"))
+dns_probe = {"resolver": None}
+
+# Per-target schedule: heap of (due, target id), the current target list and each target's live due time
+SCHEDULE_SYNC_INTERVAL = int(os.environ.get("SCHEDULE_SYNC_INTERVAL", "30"))
+DEFAULT_JITTER = float(os.environ.get("DEFAULT_JITTER", "0.1"))
+schedule = {"heap": [], "targets": {}, "due": {}, "timing": {}, "default_interval": 60, "wake": None, "dirty": False, "synced": False}
+
+# Dashboard sharding across several channel messages and admin menu paging
+DASHBOARD_MAX_CHARS = int(os.environ.get("DASHBOARD_MAX_CHARS", "3900"))
+TARGET_BATCH_SIZE = int(os.environ.get("TARGET_BATCH_SIZE", "500"))
+ADMIN_PAGE_SIZE = int(os.environ.get("ADMIN_PAGE_SIZE", "10"))
+
+# Single dashboard writer: coalesced refresh requests, unchanged-status skips and a Telegram edit budget
+DASHBOARD_MIN_REFRESH = int(os.environ.get("DASHBOARD_MIN_REFRESH", "300"))
+TELEGRAM_EDITS_PER_MINUTE = float(os.environ.get("TELEGRAM_EDITS_PER_MINUTE", "20"))
+TELEGRAM_EDIT_BURST = int(os.environ.get("TELEGRAM_EDIT_BURST", "3"))
+dashboard = {"event": None, "force": False, "full": False, "dirty": set(), "hashes": {}, "edited_at": {}, "fragments": {}}
+
+# State transitions: probe results that change a target's state become events that drive dashboard edits and admin alerts
+ALERT_BATCH_WINDOW = float(os.environ.get("ALERT_BATCH_WINDOW", "30"))
+ALERT_MAX_CHARS = int(os.environ.get("ALERT_MAX_CHARS", "4096"))
+TRANSITION_QUEUE_SIZE = int(os.environ.get("TRANSITION_QUEUE_SIZE", "10000"))
+transitions = {"queue": None, "pending": {}, "wake": None, "dropped": 0}
+
+# Probe history: raw results expire after the retention window, rollups are kept per minute/hour/day
+HISTORY_RETENTION_DAYS = int(os.environ.get("HISTORY_RETENTION_DAYS", "7"))
+HISTORY_BATCH_SIZE = int(os.environ.get("HISTORY_BATCH_SIZE", "500"))
+HISTORY_FLUSH_INTERVAL = float(os.environ.get("HISTORY_FLUSH_INTERVAL", "5"))
+HISTORY_QUEUE_SIZE = int(os.environ.get("HISTORY_QUEUE_SIZE", "20000"))
+ROLLUP_REFRESH_INTERVAL = int(os.environ.get("ROLLUP_REFRESH_INTERVAL", "60"))
+LATENCY_BUCKETS = [25, 50, 100, 200, 300, 500, 750, 1000, 2000, 5000, 10000]
+ROLLUP_GRANULARITIES = {"m": (60, timedelta(days=2)), "h": (3600, timedelta(days=35)), "d": (86400, timedelta(days=400))}
+history = {"queue": None, "dropped": 0, "summary": {}}
+
+# In-process copies of the settings document and the target list, kept coherent by watch_cache()
+CACHE_POLL_INTERVAL = int(os.environ.get("CACHE_POLL_INTERVAL", "10"))
+cache = {"config": None, "targets": None, "version": None}
+
+# In-memory metrics served by /metrics in the Prometheus text format; scraping never does I/O
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.5"))
+metrics = {"counter": {}, "gauge": {}, "histogram": {}}
+
+def metric_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def metric_inc(name, value=1, /, **labels):
+    series = metrics["counter"].setdefault(name, {})
+    key = metric_key(labels)
+    series[key] = series.get(key, 0) + value
+
+def metric_set(name, value, /, **labels):
+    metrics["gauge"].setdefault(name, {})[metric_key(labels)] = value
+
+def metric_observe(name, value, /, buckets=SECONDS_BUCKETS, **labels):
+    series = metrics["histogram"].setdefault(name, {})
+    key = metric_key(labels)
+    hist = series.get(key)
+    if hist is None:
+        hist = series[key] = {"bounds": buckets, "counts": [0] * (len(buckets) + 1), "sum": 0, "count": 0}
+    hist["counts"][bisect_left(hist["bounds"], value)] += 1
+    hist["sum"] += value
+    hist["count"] += 1
+
+@contextmanager
+def timed(name, /, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric_observe(name, time.perf_counter() - start, **labels)
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def drop_target_metrics(target_ids):
+    # Series of deleted targets would otherwise be exported, and kept in memory, forever
+    for kind in metrics.values():
+        for series in kind.values():
+            for key in [k for k in series if dict(k).get("target") in target_ids]:
+                del series[key]
+
+def snapshot_metrics():
+    # Copied on the loop, so the render thread never sees a series change while it iterates
+    return {
+        "counter": {name: dict(series) for name, series in metrics["counter"].items()},
+        "gauge": {name: dict(series) for name, series in metrics["gauge"].items()},
+        "histogram": {
+            name: {key: dict(hist, counts=list(hist["counts"])) for key, hist in series.items()}
+            for name, series in metrics["histogram"].items()
+        }
+    }
+
+def render_metrics(data):
+    lines = []
+    for kind in ("counter", "gauge"):
+        for name, series in data[kind].items():
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in series.items():
+                lines.append(f"{name}{format_labels(key)} {value}")
+    for name, series in data["histogram"].items():
+        lines.append(f"# TYPE {name} histogram")
+        for key, hist in series.items():
+            # Labels are escaped once per series; the bucket lines only differ in le
+            labels = format_labels(key)
+            prefix = f"{name}_bucket{{{labels[1:-1]}," if labels else f"{name}_bucket{{"
+            cumulative = 0
+            for bound, count in zip(hist["bounds"] + ["+Inf"], hist["counts"]):
+                cumulative += count
+                lines.append(f'{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{labels} {hist['sum']}")
+            lines.append(f"{name}_count{labels} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+async def loop_monitor():
+    # How late a fixed sleep wakes up is how long the loop was busy with other work
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(time.perf_counter() - start - LOOP_LAG_INTERVAL, 0)
+        metric_set("monitor_event_loop_lag_last_seconds", lag)
+        metric_observe("monitor_event_loop_lag_seconds", lag)
+        metric_set("monitor_history_queue_size", history["queue"].qsize() if history["queue"] else 0)
+        metric_set("monitor_targets", len(schedule["targets"]))
+
+async def metrics_handler(request):
+    text = await asyncio.to_thread(render_metrics, snapshot_metrics())
+    return web.Response(text=text, content_type="text/plain", charset="utf-8")
+
 async def get_config():
+    if cache["config"] is not None:
+        return cache["config"]
+    with timed("monitor_mongo_seconds", op="get_config"):
+        return await load_config()
+
+async def load_config():
     config = await config_col.find_one({"_id": "settings"})
     if not config:
         # Default settings
@@ -52,12 +279,117 @@ async def get_config():
     if "message_id" not in config:
         config["message_id"] = int(os.environ.get("MESSAGE_ID", "0"))
         updated = True
+    if "message_ids" not in config:
+        config["message_ids"] = [config["message_id"]] if config["message_id"] else []
+        updated = True
     
     if updated:
         await config_col.replace_one({"_id": "settings"}, config)
     
+    cache["config"] = config
     return config
 
+async def get_targets():
+    if cache["targets"] is None:
+        targets = {}
+        with timed("monitor_mongo_seconds", op="load_targets"):
+            # Streamed in batches so large target lists never sit in one cursor reply
+            async for bot in bots_col.find(batch_size=TARGET_BATCH_SIZE):
+                targets[str(bot["_id"])] = bot
+        cache["targets"] = targets
+    return cache["targets"]
+
+def mark_schedule_dirty():
+    schedule["dirty"] = True
+    if schedule["wake"] is not None:
+        schedule["wake"].set()
+
+def cache_target(target_id, bot):
+    if cache["targets"] is not None:
+        if bot is None:
+            cache["targets"].pop(target_id, None)
+        else:
+            cache["targets"][target_id] = bot
+    mark_schedule_dirty()
+
+async def bump_cache_version():
+    # Lets instances without change streams notice writes made elsewhere
+    doc = await config_col.find_one_and_update(
+        {"_id": "cache_version"}, {"$inc": {"n": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    if cache["version"] is not None and doc["n"] != cache["version"] + 1:
+        # Another instance wrote in between; let the poller reload everything
+        return
+    cache["version"] = doc["n"]
+
+async def save_target(bot_id, update):
+    from bson import ObjectId
+    with timed("monitor_mongo_seconds", op="save_target"):
+        bot = await bots_col.find_one_and_update({"_id": ObjectId(bot_id)}, update, return_document=ReturnDocument.AFTER)
+    cache_target(bot_id, bot)
+    await bump_cache_version()
+    return bot
+
+async def save_config(fields):
+    await config_col.update_one({"_id": "settings"}, {"$set": fields}, upsert=True)
+    if cache["config"] is not None:
+        cache["config"].update(fields)
+    mark_schedule_dirty()
+    await bump_cache_version()
+
+async def reload_cache():
+    cache["config"] = None
+    cache["targets"] = None
+    await get_config()
+    await get_targets()
+    mark_schedule_dirty()
+
+def apply_change(change):
+    op = change["operationType"]
+    if op in ("drop", "rename", "dropDatabase", "invalidate"):
+        cache["config"] = None
+        cache["targets"] = None
+        mark_schedule_dirty()
+        return
+    key = change.get("documentKey", {}).get("_id")
+    doc = change.get("fullDocument")
+    if change["ns"]["coll"] == bots_col.name:
+        cache_target(str(key), None if op == "delete" else doc)
+    elif key == "settings":
+        cache["config"] = None if op == "delete" or doc is None else doc
+        mark_schedule_dirty()
+
+async def poll_cache_version():
+    while True:
+        await asyncio.sleep(CACHE_POLL_INTERVAL)
+        try:
+            doc = await config_col.find_one({"_id": "cache_version"})
+            version = doc["n"] if doc else 0
+            if version != cache["version"]:
+                await reload_cache()
+                cache["version"] = version
+        except Exception as e:
+            print("Cache poll failed:", e)
+
+async def watch_cache():
+    pipeline = [{"$match": {"ns.coll": {"$in": [bots_col.name, config_col.name]}}}]
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup") as stream:
+                # Anything written before the stream opened is picked up by a fresh load
+                await reload_cache()
+                async for change in stream:
+                    apply_change(change)
+        except OperationFailure as e:
+            if e.code == 40573:
+                print("Change streams unavailable, polling for config changes")
+                await poll_cache_version()
+                return
+            print("Change stream failed:", e)
+        except Exception as e:
+            print("Change stream failed:", e)
+        await asyncio.sleep(5)
+
 def get_main_menu():
     return InlineKeyboardMarkup([
         [
@@ -88,13 +420,6 @@ async def check_admin(client, callback_query):
 async def back_start_callback(client, callback_query):
     await callback_query.edit_message_text("Welcome! Manage your monitoring URLs here:", reply_markup=get_main_menu())
 
-async def check_service_simple(session, url, timeout):
-    try:
-        async with session.get(url, timeout=timeout) as r:
-            return r.status == 200
-    except:
-        return False
-
 @app.on_callback_query(filters.regex("^settings$"))
 async def settings_callback(client, callback_query):
     config = await get_config()
@@ -102,7 +427,7 @@ async def settings_callback(client, callback_query):
         "⚙️ **Settings**\n\n"
         f"**Update Interval:** `{config['update_interval']}s`\n"
         f"**Channel ID:** `{config['channel_id']}`\n"
-        f"**Message ID:** `{config['message_id']}`"
+        f"**Message IDs:** `{', '.join(str(m) for m in config['message_ids']) or config['message_id']}`"
     )
     buttons = [
         [InlineKeyboardButton("⏱️ Change Interval", callback_data="set_interval")],
@@ -124,7 +449,7 @@ async def set_channel_callback(client, callback_query):
 async def set_message_callback(client, callback_query):
     user_data[callback_query.from_user.id] = {"action": "setting_message"}
     buttons = [[InlineKeyboardButton("🔙 Cancel", callback_data="settings")]]
-    await callback_query.edit_message_text("Please send the new Message ID (e.g., 123):", reply_markup=InlineKeyboardMarkup(buttons))
+    await callback_query.edit_message_text("Please send the new Message ID (e.g., 123).\nSend several IDs separated by spaces to split the dashboard across messages:", reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_callback_query(filters.regex("^set_interval$"))
 async def set_interval_callback(client, callback_query):
@@ -132,39 +457,69 @@ async def set_interval_callback(client, callback_query):
     buttons = [[InlineKeyboardButton("🔙 Cancel", callback_data="settings")]]
     await callback_query.edit_message_text("Please send the new interval in seconds (e.g., 60):", reply_markup=InlineKeyboardMarkup(buttons))
 
-@app.on_callback_query(filters.regex("^manage_bots$"))
+@app.on_callback_query(filters.regex(r"^manage_bots(_\d+)?$"))
 async def manage_bots_callback(client, callback_query):
-    bots = await bots_col.find().to_list(length=100)
-    if not bots:
+    targets = await get_targets()
+    if not targets:
         await callback_query.answer("No URLs found!", show_alert=True)
         return
     
-    config = await get_config()
-    timeout = config.get("update_interval", 10)
+    pages = (len(targets) + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE
+    page = 0
+    if callback_query.data.startswith("manage_bots_"):
+        page = int(callback_query.data.split("_")[2])
+    page = min(page, pages - 1)
+    start = page * ADMIN_PAGE_SIZE
+    bots = list(islice(targets.values(), start, start + ADMIN_PAGE_SIZE))
+    results = await get_results()
     
-    text = "**Select a URL to manage:**\n\n"
+    text = f"**Select a URL to manage:** (page {page + 1}/{pages})\n\n"
     buttons = []
-    async with aiohttp.ClientSession() as session:
-        for i, bot in enumerate(bots, 1):
-            is_alive = await check_service_simple(session, bot["url"], timeout)
-            status_emoji = "🟢" if is_alive else "🔴"
-            text += f"> {i}. {bot['url']} {status_emoji}\n\n"
-            buttons.append([InlineKeyboardButton(f"{status_emoji} {bot['name']}", callback_data=f"bot_{bot['_id']}")])
+    for i, bot in enumerate(bots, start + 1):
+        result = results.get(str(bot["_id"]))
+        if bot.get("maintenance", False):
+            status_emoji = "🟡"
+        elif result is None:
+            status_emoji = "⚪"
+        else:
+            status_emoji = "🟢" if result["alive"] else "🔴"
+        text += f"> {i}. {bot['url']} {status_emoji}\n\n"
+        buttons.append([InlineKeyboardButton(f"{status_emoji} {bot['name']}", callback_data=f"bot_{bot['_id']}")])
     
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️ Prev", callback_data=f"manage_bots_{page - 1}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"manage_bots_{page + 1}"))
+    if nav:
+        buttons.append(nav)
     buttons.append([InlineKeyboardButton("🔙 Back", callback_data="back_start")])
     await callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(buttons))
 
 @app.on_callback_query(filters.regex("^bot_"))
 async def bot_info_callback(client, callback_query):
-    bot_id = callback_query.data.split("_")[1]
-    from bson import ObjectId
-    bot = await bots_col.find_one({"_id": ObjectId(bot_id)})
+    await show_bot_info(callback_query, callback_query.data.split("_")[1])
+
+async def show_bot_info(callback_query, bot_id):
+    # Shared with the callbacks that change a setting and then re-render this menu
+    bot = (await get_targets()).get(bot_id)
     
     if not bot:
         await callback_query.answer("URL not found!")
         return
 
     text = f"**URL Name:** `{bot['name']}`\n**URL:** `{bot['url']}`"
+    if bot.get("interval"):
+        text += f"\n**Interval:** `{bot['interval']}s ± {bot.get('jitter', round(bot['interval'] * DEFAULT_JITTER))}s`"
+    else:
+        text += "\n**Interval:** `global`"
+    probe = bot.get("probe", "get")
+    expect = ", ".join(str(c) for c in bot.get("expect_status", [200]))
+    text += f"\n**Probe:** `{probe.upper()}`"
+    if probe in ("get", "head"):
+        text += f" · expect `{expect}`"
+    if bot.get("keyword") and probe != "head":
+        text += f" · keyword `{bot['keyword']}`"
     is_maintenance = bot.get("maintenance", False)
     m_status = "ON 🟡" if is_maintenance else "OFF ✅"
     buttons = [
@@ -172,6 +527,11 @@ async def bot_info_callback(client, callback_query):
             InlineKeyboardButton("📝 Name", callback_data=f"edit_name_{bot_id}"),
             InlineKeyboardButton("🔗 URL", callback_data=f"edit_url_{bot_id}")
         ],
+        [InlineKeyboardButton("⏱️ Interval", callback_data=f"edit_sched_{bot_id}")],
+        [
+            InlineKeyboardButton(f"🔎 Probe: {probe.upper()}", callback_data=f"cycle_probe_{bot_id}"),
+            InlineKeyboardButton("🎯 Checks", callback_data=f"edit_checks_{bot_id}")
+        ],
         [InlineKeyboardButton(f"🛠️ Maintenance: {m_status}", callback_data=f"toggle_maint_{bot_id}")],
         [InlineKeyboardButton("🗑️ Delete", callback_data=f"delete_{bot_id}")],
         [InlineKeyboardButton("🔙 Back", callback_data="manage_bots")]
@@ -181,13 +541,24 @@ async def bot_info_callback(client, callback_query):
 @app.on_callback_query(filters.regex("^toggle_maint_"))
 async def toggle_maint_callback(client, callback_query):
     bot_id = callback_query.data.split("_")[2]
-    from bson import ObjectId
-    bot = await bots_col.find_one({"_id": ObjectId(bot_id)})
+    bot = (await get_targets()).get(bot_id)
     if bot:
         new_state = not bot.get("maintenance", False)
-        await bots_col.update_one({"_id": ObjectId(bot_id)}, {"$set": {"maintenance": new_state}})
+        await save_target(bot_id, {"$set": {"maintenance": new_state}})
+        probe_soon(bot_id)
         await callback_query.answer(f"Maintenance mode: {'ON' if new_state else 'OFF'}")
-        await bot_info_callback(client, callback_query)
+        await show_bot_info(callback_query, bot_id)
+
+@app.on_callback_query(filters.regex("^cycle_probe_"))
+async def cycle_probe_callback(client, callback_query):
+    bot_id = callback_query.data.split("_")[2]
+    bot = (await get_targets()).get(bot_id)
+    if bot:
+        current = bot.get("probe", "get")
+        new_probe = PROBE_TYPES[(PROBE_TYPES.index(current) + 1) % len(PROBE_TYPES)] if current in PROBE_TYPES else "get"
+        await save_target(bot_id, {"$set": {"probe": new_probe}})
+        await callback_query.answer(f"Probe type: {new_probe.upper()}")
+        await show_bot_info(callback_query, bot_id)
 
 @app.on_callback_query(filters.regex("^add_bot$"))
 async def add_bot_callback(client, callback_query):
@@ -209,11 +580,27 @@ async def edit_url_callback(client, callback_query):
     buttons = [[InlineKeyboardButton("🔙 Cancel", callback_data=f"bot_{bot_id}")]]
     await callback_query.edit_message_text("Please send the NEW health check URL:", reply_markup=InlineKeyboardMarkup(buttons))
 
+@app.on_callback_query(filters.regex("^edit_sched_"))
+async def edit_sched_callback(client, callback_query):
+    bot_id = callback_query.data.split("_")[2]
+    user_data[callback_query.from_user.id] = {"action": "editing_schedule", "bot_id": bot_id}
+    buttons = [[InlineKeyboardButton("🔙 Cancel", callback_data=f"bot_{bot_id}")]]
+    await callback_query.edit_message_text("Please send the probe interval in seconds, optionally followed by the jitter (e.g., `300 30`).\nSend `0` to use the global interval.", reply_markup=InlineKeyboardMarkup(buttons))
+
+@app.on_callback_query(filters.regex("^edit_checks_"))
+async def edit_checks_callback(client, callback_query):
+    bot_id = callback_query.data.split("_")[2]
+    user_data[callback_query.from_user.id] = {"action": "editing_checks", "bot_id": bot_id}
+    buttons = [[InlineKeyboardButton("🔙 Cancel", callback_data=f"bot_{bot_id}")]]
+    await callback_query.edit_message_text("Please send the expected status codes, optionally followed by a keyword the response must contain (e.g., `200,204 healthy`).\nSend `-` instead of codes to keep the default `200`, or just `-` to reset both.", reply_markup=InlineKeyboardMarkup(buttons))
+
 @app.on_callback_query(filters.regex("^delete_"))
 async def delete_bot_callback(client, callback_query):
     bot_id = callback_query.data.split("_")[1]
     from bson import ObjectId
     await bots_col.delete_one({"_id": ObjectId(bot_id)})
+    cache_target(bot_id, None)
+    await bump_cache_version()
     await callback_query.answer("URL deleted!")
     await manage_bots_callback(client, callback_query)
 
@@ -228,28 +615,8 @@ async def refresh_now_callback(client, callback_query):
         asyncio.create_task(run_manual_update())
 
 async def run_manual_update():
-    async with aiohttp.ClientSession() as session:
-        config = await get_config()
-        timeout = config.get("update_interval", 60)
-        channel_id = config.get("channel_id")
-        message_id = config.get("message_id")
-        bots = await bots_col.find().to_list(length=100)
-        
-        if not bots:
-            text = "<blockquote>❤️ᴏғғɪᴄɪᴧʟ ʙσᴛs:\n\nNo URLs configured.</blockquote>"
-        else:
-            tasks = [check_service(session, b["name"], b["url"], timeout, b.get("maintenance", False)) for b in bots]
-            results = await asyncio.gather(*tasks)
-            content = "\n\n".join(results)
-            text = f"<blockquote>❤️ᴏғғɪᴄɪᴧʟ ʙσᴛs:\n\n{content}</blockquote>"
-        
-        ist = timezone(timedelta(hours=5, minutes=30))
-        now_ist = datetime.now(ist).strftime('%H:%M:%S')
-        text += f"\n\nLast update: {now_ist}"
-        try:
-            await app.edit_message_text(channel_id, message_id, text, parse_mode=enums.ParseMode.HTML)
-        except Exception as e:
-            print("Manual update failed:", e)
+    await refresh_results()
+    request_dashboard_refresh(force=True)
 
 @app.on_message(filters.private & ~filters.command("start"))
 async def handle_text(client, message):
@@ -269,31 +636,75 @@ async def handle_text(client, message):
     elif action == "adding_url":
         name = user_data[user_id]["name"]
         url = message.text
-        await bots_col.insert_one({"name": name, "url": url})
+        bot = {"name": name, "url": url}
+        await bots_col.insert_one(bot)
+        cache_target(str(bot["_id"]), bot)
+        await bump_cache_version()
         del user_data[user_id]
         await message.reply(f"URL `{name}` added successfully!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="back_start")]]))
     
     elif action == "editing_name":
         bot_id = user_data[user_id]["bot_id"]
-        from bson import ObjectId
-        await bots_col.update_one({"_id": ObjectId(bot_id)}, {"$set": {"name": message.text}})
+        await save_target(bot_id, {"$set": {"name": message.text}})
         del user_data[user_id]
         await message.reply("Name updated successfully!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="manage_bots")]]))
 
     elif action == "editing_url":
         bot_id = user_data[user_id].get("bot_id")
-        from bson import ObjectId
-        await bots_col.update_one({"_id": ObjectId(bot_id)}, {"$set": {"url": message.text}})
+        await save_target(bot_id, {"$set": {"url": message.text}})
         del user_data[user_id]
         await message.reply("URL updated successfully!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="manage_bots")]]))
 
+    elif action == "editing_schedule":
+        bot_id = user_data[user_id].get("bot_id")
+        try:
+            parts = [int(p) for p in message.text.split()]
+            if not 1 <= len(parts) <= 2:
+                raise ValueError
+        except ValueError:
+            await message.reply("Please send one or two numbers, e.g. `300 30`.")
+            return
+        if parts[0] == 0:
+            update = {"$unset": {"interval": "", "jitter": ""}}
+        elif parts[0] < 10 or parts[0] > 86400:
+            await message.reply("Interval must be between 10 seconds and 86400 seconds (24 hours).")
+            return
+        elif len(parts) == 2:
+            update = {"$set": {"interval": parts[0], "jitter": max(parts[1], 0)}}
+        else:
+            update = {"$set": {"interval": parts[0]}, "$unset": {"jitter": ""}}
+        await save_target(bot_id, update)
+        del user_data[user_id]
+        await message.reply("Interval updated successfully!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data=f"bot_{bot_id}")]]))
+
+    elif action == "editing_checks":
+        bot_id = user_data[user_id].get("bot_id")
+        codes, _, keyword = message.text.strip().partition(" ")
+        try:
+            expect = [int(c) for c in codes.split(",") if c] if codes != "-" else []
+        except ValueError:
+            await message.reply("Please send status codes like `200,204`, or `-` for the default.")
+            return
+        update = {"$set": {}, "$unset": {}}
+        if expect:
+            update["$set"]["expect_status"] = expect
+        else:
+            update["$unset"]["expect_status"] = ""
+        if keyword.strip():
+            update["$set"]["keyword"] = keyword.strip()
+        else:
+            update["$unset"]["keyword"] = ""
+        await save_target(bot_id, {k: v for k, v in update.items() if v})
+        del user_data[user_id]
+        await message.reply("Checks updated successfully!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data=f"bot_{bot_id}")]]))
+
     elif action == "setting_interval":
         try:
             val = int(message.text)
             if val < 30 or val > 1800:
                 await message.reply("Interval must be between 30 seconds and 1800 seconds (30 min).")
                 return
-            await config_col.update_one({"_id": "settings"}, {"$set": {"update_interval": val}}, upsert=True)
+            await save_config({"update_interval": val})
             del user_data[user_id]
             await message.reply(f"Interval set to {val}s!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="settings")]]))
         except ValueError:
@@ -302,7 +713,7 @@ async def handle_text(client, message):
     elif action == "setting_channel":
         try:
             val = int(message.text)
-            await config_col.update_one({"_id": "settings"}, {"$set": {"channel_id": val}}, upsert=True)
+            await save_config({"channel_id": val})
             del user_data[user_id]
             await message.reply(f"Channel ID updated to `{val}`!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="settings")]]))
         except ValueError:
@@ -310,61 +721,1082 @@ async def handle_text(client, message):
 
     elif action == "setting_message":
         try:
-            val = int(message.text)
-            await config_col.update_one({"_id": "settings"}, {"$set": {"message_id": val}}, upsert=True)
+            vals = [int(v) for v in message.text.replace(",", " ").split()]
+            if not vals:
+                raise ValueError
+            await save_config({"message_id": vals[0], "message_ids": vals})
             del user_data[user_id]
-            await message.reply(f"Message ID updated to `{val}`!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="settings")]]))
+            val = ", ".join(str(v) for v in vals)
+            await message.reply(f"Message IDs updated to `{val}`!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="settings")]]))
         except ValueError:
             await message.reply("Please send a valid number.")
 
-async def check_service(session, name, url, timeout, maintenance=False):
-    if maintenance:
+class CachingResolver(AbstractResolver):
+    # Resolves with dnspython and caches answers for their TTL; anything it cannot answer goes to the system resolver
+    def __init__(self):
+        self._resolver = dns.asyncresolver.Resolver()
+        self._resolver.lifetime = DNS_LIFETIME
+        self._fallback = ThreadedResolver()
+        self._cache = {}
+
+    async def _lookup(self, host, family):
+        if family == socket.AF_INET:
+            queries = [("A", socket.AF_INET)]
+        elif family == socket.AF_INET6:
+            queries = [("AAAA", socket.AF_INET6)]
+        else:
+            queries = [("A", socket.AF_INET), ("AAAA", socket.AF_INET6)]
+        addrs = []
+        ttl = DNS_MAX_TTL
+        for rdtype, addr_family in queries:
+            try:
+                answer = await self._resolver.resolve(host, rdtype)
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+                continue
+            ttl = min(ttl, answer.rrset.ttl)
+            addrs.extend((addr_family, r.address) for r in answer)
+        if not addrs:
+            raise OSError(f"No DNS records for {host}")
+        return addrs, max(ttl, DNS_MIN_TTL)
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        now = time.monotonic()
+        key = (host, family)
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            addrs = cached[1]
+        else:
+            try:
+                addrs, ttl = await self._lookup(host, family)
+            except Exception:
+                # /etc/hosts entries, short container names and the like; cached too so dnspython is not retried on every probe
+                answers = await self._fallback.resolve(host, port, family)
+                addrs, ttl = [(a["family"], a["host"]) for a in answers], DNS_MIN_TTL
+            if len(self._cache) > 10000:
+                self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+            self._cache[key] = (now + ttl, addrs)
+        return [
+            {"hostname": host, "host": addr, "port": port, "family": addr_family, "proto": 0, "flags": socket.AI_NUMERICHOST}
+            for addr_family, addr in addrs
+        ]
+
+    async def close(self):
+        await self._fallback.close()
+
+class ProbeConnector(aiohttp.TCPConnector):
+    # aiohttp neither counts idle connections against limit nor caps them, so a large fleet would pin
+    # one socket per host; only the most recently used PROBE_MAX_IDLE_HOSTS hosts keep theirs
+    def __init__(self, *args, max_idle_hosts, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._max_idle_hosts = max_idle_hosts
+        self._idle_hosts = OrderedDict()
+
+    def set_keepalive(self, seconds):
+        self._keepalive_timeout = seconds
+
+    def _release(self, key, protocol, *, should_close=False):
+        super()._release(key, protocol, should_close=should_close)
+        if not self._conns.get(key):
+            return
+        self._idle_hosts[key] = None
+        self._idle_hosts.move_to_end(key)
+        while len(self._idle_hosts) > self._max_idle_hosts:
+            oldest, _ = self._idle_hosts.popitem(last=False)
+            for proto, _ in self._conns.pop(oldest, ()):
+                proto.close()
+
+def probe_keepalive():
+    if PROBE_KEEPALIVE:
+        return PROBE_KEEPALIVE
+    # Outlive the gap between two scheduled probes of a target, but not the idle limits servers commonly apply
+    interval = schedule["default_interval"]
+    return min(interval * (1 + DEFAULT_JITTER) + 5, 300)
+
+def update_probe_keepalive():
+    session = probe_transport["session"]
+    if session is not None:
+        session.connector.set_keepalive(probe_keepalive())
+
+def create_probe_session():
+    # One SSL context for every probe so TLS setup is not rebuilt per request
+    connector = ProbeConnector(
+        limit=PROBE_CONCURRENCY,
+        limit_per_host=PROBE_PER_HOST,
+        keepalive_timeout=probe_keepalive(),
+        max_idle_hosts=PROBE_MAX_IDLE_HOSTS,
+        resolver=CachingResolver(),
+        use_dns_cache=False,
+        ssl=ssl.create_default_context()
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+def get_probe_session():
+    session = probe_transport["session"]
+    if session is None or session.closed:
+        session = probe_transport["session"] = create_probe_session()
+    return session
+
+def new_result(bot):
+    return {
+        "id": str(bot["_id"]),
+        "name": bot["name"],
+        "url": bot["url"],
+        "maintenance": bot.get("maintenance", False),
+        "alive": False,
+        "status": None,
+        "elapsed": None,
+        "error": None,
+        "checked_at": time.time()
+    }
+
+def probe_address(url, default_port):
+    parts = urlsplit(url if "://" in url else f"//{url}")
+    port = parts.port or {"https": 443, "http": 80}.get(parts.scheme, default_port)
+    return parts.hostname or url, port
+
+async def read_prefix(response, keyword):
+    data = b""
+    while len(data) < BODY_PREFIX_BYTES:
+        chunk = await response.content.read(BODY_PREFIX_BYTES - len(data))
+        if not chunk:
+            break
+        data += chunk
+        if keyword in data:
+            break
+    return data
+
+async def check_http(session, bot, method, timeout, result):
+    keyword = bot.get("keyword")
+    async with session.request(method, bot["url"], timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+        # Latency is time to headers; leaving the block early drops the rest of the body unread
+        result["elapsed"] = round((time.time() - result["checked_at"]) * 1000)
+        result["status"] = r.status
+        result["alive"] = r.status in bot.get("expect_status", [200])
+        if result["alive"] and keyword and method == "GET":
+            if keyword.encode() not in await read_prefix(r, keyword.encode()):
+                result["alive"] = False
+                result["error"] = "keyword"
+
+async def check_tcp(bot, timeout, result):
+    host, port = probe_address(bot["url"], 443)
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    result["elapsed"] = round((time.time() - result["checked_at"]) * 1000)
+    result["alive"] = True
+    writer.close()
+
+async def check_dns(bot, timeout, result):
+    if dns_probe["resolver"] is None:
+        # Separate from the transport's caching resolver so every probe really queries DNS
+        dns_probe["resolver"] = dns.asyncresolver.Resolver()
+    host, _ = probe_address(bot["url"], 53)
+    answer = await dns_probe["resolver"].resolve(host, "A", lifetime=timeout)
+    result["elapsed"] = round((time.time() - result["checked_at"]) * 1000)
+    result["alive"] = True
+    keyword = bot.get("keyword")
+    if keyword and not any(keyword in r.to_text() for r in answer):
+        result["alive"] = False
+        result["error"] = "keyword"
+
+async def check_service(session, bot, timeout):
+    result = new_result(bot)
+    if result["maintenance"]:
+        return result
+    probe = bot.get("probe", "get")
+    try:
+        if probe == "tcp":
+            await check_tcp(bot, timeout, result)
+        elif probe == "dns":
+            await check_dns(bot, timeout, result)
+        else:
+            await check_http(session, bot, "HEAD" if probe == "head" else "GET", timeout, result)
+    except Exception:
+        pass
+    return result
+
+def latency_quantile(target_id, q):
+    window = latencies.get(target_id)
+    if not window or len(window) < 5:
+        return None
+    ordered = sorted(window)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] / 1000
+
+def probe_timeout(target_id):
+    p99 = latency_quantile(target_id, 0.99)
+    if p99 is None:
+        return PROBE_TIMEOUT_MAX
+    return min(max(p99 * PROBE_TIMEOUT_FACTOR, PROBE_TIMEOUT_MIN), PROBE_TIMEOUT_MAX)
+
+def record_latency(result):
+    if result["alive"] and result["elapsed"] is not None:
+        window = latencies.get(result["id"])
+        if window is None:
+            window = latencies[result["id"]] = deque(maxlen=LATENCY_WINDOW)
+        window.append(result["elapsed"])
+
+async def hedged_check(session, bot, deadline):
+    target_id = str(bot["_id"])
+    timeout = min(probe_timeout(target_id), deadline)
+    first = asyncio.create_task(check_service(session, bot, timeout))
+    pending = {first}
+    try:
+        p95 = latency_quantile(target_id, 0.95)
+        if p95 is None or max(p95, HEDGE_MIN_DELAY) >= timeout:
+            return await first
+        done, pending = await asyncio.wait(pending, timeout=max(p95, HEDGE_MIN_DELAY))
+        if done:
+            return first.result()
+        # Slower than 95% of recent probes: race a second attempt and take the first success
+        metric_inc("monitor_probe_hedges_total", target=target_id)
+        pending.add(asyncio.create_task(check_service(session, bot, timeout)))
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result["alive"] or not pending:
+                    return result
+    finally:
+        for task in pending:
+            task.cancel()
+
+def damp_flaps(result):
+    # A target only changes state after FLAP_THRESHOLD consecutive results that disagree with it
+    raw = result["alive"]
+    result["raw_alive"] = raw
+    if result["maintenance"]:
+        flaps.pop(result["id"], None)
+        return result
+    flap = flaps.get(result["id"])
+    if flap is None:
+        flaps[result["id"]] = {"state": raw, "count": 0}
+        return result
+    if raw == flap["state"]:
+        flap["count"] = 0
+    else:
+        flap["count"] += 1
+        if flap["count"] >= FLAP_THRESHOLD:
+            flap["state"] = raw
+            flap["count"] = 0
+    result["alive"] = flap["state"]
+    return result
+
+async def limited_check(session, bot, deadline):
+    if bot.get("maintenance", False):
+        return await check_service(session, bot, deadline)
+    if probe_limits["global"] is None:
+        probe_limits["global"] = asyncio.Semaphore(PROBE_CONCURRENCY)
+    host = urlsplit(bot["url"]).hostname or bot["url"]
+    hosts = probe_limits["hosts"]
+    slot = hosts.get(host)
+    if slot is None:
+        slot = hosts[host] = [asyncio.Semaphore(PROBE_PER_HOST), 0]
+    slot[1] += 1
+    try:
+        # Take the host slot first so a slow host queues without holding global slots
+        async with slot[0]:
+            async with probe_limits["global"]:
+                probe_limits["in_flight"] += 1
+                metric_set("monitor_probes_in_flight", probe_limits["in_flight"])
+                try:
+                    result = await hedged_check(session, bot, deadline)
+                finally:
+                    probe_limits["in_flight"] -= 1
+                    metric_set("monitor_probes_in_flight", probe_limits["in_flight"])
+                observe_probe(result)
+                record_latency(result)
+                return result
+    finally:
+        slot[1] -= 1
+        if not slot[1]:
+            hosts.pop(host, None)
+
+def observe_probe(result):
+    if result["elapsed"] is not None:
+        metric_observe("monitor_probe_duration_seconds", result["elapsed"] / 1000, target=result["id"])
+    if result["alive"]:
+        outcome = "up"
+    elif result["status"] is not None:
+        outcome = "down"
+    else:
+        outcome = "error"
+    metric_inc("monitor_probes_total", target=result["id"], result=outcome)
+    metric_set("monitor_target_info", 1, target=result["id"], name=result["name"])
+
+async def probe_many(session, bots, deadline=PROBE_CYCLE_DEADLINE):
+    # Yields results as they finish; targets still running at the deadline come back with error="deadline"
+    pending = {asyncio.create_task(limited_check(session, b, deadline)): b for b in bots}
+    end = time.monotonic() + deadline
+    try:
+        while pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.pop(task)
+                yield task.result()
+        for task, bot in list(pending.items()):
+            task.cancel()
+            del pending[task]
+            metric_inc("monitor_probes_total", target=str(bot["_id"]), result="deadline")
+            result = new_result(bot)
+            result["error"] = "deadline"
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+def format_status(result):
+    name = result["name"]
+    if result["maintenance"]:
         return f"╭⎋ {name}  \n╰⊚ ᴍᴧɪɴᴛᴇɴᴧɴᴄᴇ 🟡"
-    start_time = time.time()
+    summary = format_summary(result["id"])
+    if summary:
+        summary = f" · {summary}"
+    if result.get("stale"):
+        summary += " ⏳"
+    raw_alive = result.get("raw_alive", result["alive"])
+    if result["alive"]:
+        detail = f"{result['elapsed']}ms" if raw_alive else "checking"
+        return f"╭⎋ {name}  \n╰⊚ ᴀʟɪᴠᴇ  🟢 ({detail}){summary}"
+    if raw_alive:
+        return f"╭⎋ {name}  \n╰⊚ Not working 🔴 (recovering){summary}"
+    if result.get("error") == "keyword":
+        return f"╭⎋ {name}  \n╰⊚ Not working 🔴 (keyword missing){summary}"
+    if result["status"] is not None:
+        return f"╭⎋ {name}  \n╰⊚ Not working 🔴 ({result['status']}){summary}"
+    return f"╭⎋ {name}  \n╰⊚ Not working 🔴 (Error){summary}"
+
+def fragment_key(result):
+    # Everything a dashboard line shows except latency and the rollup summary, which only move on periodic re-renders
+    return (result["name"], result["maintenance"], result["alive"], result.get("raw_alive", result["alive"]),
+            result["status"], result.get("error"), result.get("stale", False))
+
+def dashboard_fragment(result, fresh=False):
+    key = fragment_key(result)
+    cached = dashboard["fragments"].get(result["id"])
+    if fresh or cached is None or cached[0] != key:
+        cached = dashboard["fragments"][result["id"]] = (key, format_status(result))
+    return cached[1]
+
+def render_dashboard(results, page=1, pages=1, fresh=False):
+    title = "❤️ᴏғғɪᴄɪᴧʟ ʙσᴛs:" if pages == 1 else f"❤️ᴏғғɪᴄɪᴧʟ ʙσᴛs ({page}/{pages}):"
+    if not results:
+        return f"<blockquote>{title}\n\nNo URLs configured.</blockquote>"
+    # Telegram rejects messages over 4096 characters, so overflow is summarised instead of failing the edit
+    parts = []
+    size = len(title)
+    for i, r in enumerate(results):
+        line = dashboard_fragment(r, fresh)
+        if size + len(line) + 2 > DASHBOARD_MAX_CHARS:
+            parts.append(f"…and {len(results) - i} more")
+            break
+        parts.append(line)
+        size += len(line) + 2
+    content = "\n\n".join(parts)
+    return f"<blockquote>{title}\n\n{content}</blockquote>"
+
+def stamp_dashboard(text):
+    now_ist = datetime.now(IST).strftime('%H:%M:%S')
+    return text + f"\n\nLast update: {now_ist}"
+
+def dashboard_shard(target_id, count):
+    # Hash of the target id, so adding or removing targets never moves the others
+    return zlib.crc32(target_id.encode()) % count
+
+def dashboard_shards(results, message_ids):
+    shards = [[] for _ in message_ids]
+    for r in results:
+        shards[dashboard_shard(r["id"], len(message_ids))].append(r)
+    return list(zip(message_ids, shards))
+
+def status_digest(channel_id, results):
+    # Latency is left out on purpose: only state changes should cost a Telegram edit
+    h = hashlib.sha1(str(channel_id).encode())
+    for r in results:
+        h.update(repr((r["id"],) + fragment_key(r)).encode())
+    return h.hexdigest()
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        # Owe the whole wait up front so no edit goes out before Telegram allows it
+        self.tokens = -seconds * self.rate
+        self.updated = time.monotonic()
+
+edit_limiter = TokenBucket(TELEGRAM_EDITS_PER_MINUTE / 60, TELEGRAM_EDIT_BURST)
+
+async def send_edit(chat_id, message_id, text):
+    for _ in range(3):
+        await edit_limiter.acquire()
+        try:
+            with timed("monitor_telegram_edit_seconds"):
+                await app.edit_message_text(chat_id, message_id, text, parse_mode=enums.ParseMode.HTML)
+            metric_inc("monitor_telegram_edits_total", result="ok")
+            return True
+        except MessageNotModified:
+            metric_inc("monitor_telegram_edits_total", result="not_modified")
+            return True
+        except FloodWait as e:
+            metric_inc("monitor_telegram_edits_total", result="flood_wait")
+            print(f"Flood wait of {e.value}s on message {message_id}")
+            edit_limiter.pause(e.value)
+        except Exception as e:
+            metric_inc("monitor_telegram_edits_total", result="error")
+            print(f"Update failed for message {message_id}:", e)
+            return False
+    return False
+
+async def write_dashboard(force=False, full=True, dirty=()):
+    config = await get_config()
+    channel_id = config.get("channel_id")
+    message_ids = config.get("message_ids")
+    if not channel_id or not message_ids:
+        return
+    shards = dashboard_shards(current_results(), message_ids)
+    pages = len(shards)
+    for page, (message_id, results) in enumerate(shards, 1):
+        age = time.monotonic() - dashboard["edited_at"].get(message_id, 0)
+        due = DASHBOARD_MIN_REFRESH and age >= DASHBOARD_MIN_REFRESH
+        # Transition events name the messages they touch; the rest are only looked at on full passes
+        if not (force or full or due or message_id in dirty):
+            continue
+        digest = status_digest(channel_id, results)
+        if not force and not due and dashboard["hashes"].get(message_id) == digest:
+            continue
+        text = stamp_dashboard(render_dashboard(results, page, pages, fresh=force or due))
+        if await send_edit(channel_id, message_id, text):
+            dashboard["hashes"][message_id] = digest
+            dashboard["edited_at"][message_id] = time.monotonic()
+
+def request_dashboard_refresh(force=False, message_ids=None):
+    # Requests made while a write is running collapse into a single follow-up pass
+    if force:
+        dashboard["force"] = True
+    if message_ids is None:
+        dashboard["full"] = True
+    else:
+        dashboard["dirty"].update(message_ids)
+    if dashboard["event"] is not None:
+        dashboard["event"].set()
+
+async def dashboard_writer():
+    dashboard["event"] = event = asyncio.Event()
+    dashboard["full"] = True
+    event.set()
+    while True:
+        await event.wait()
+        event.clear()
+        force, full, dirty = dashboard["force"], dashboard["full"], dashboard["dirty"]
+        dashboard["force"] = dashboard["full"] = False
+        dashboard["dirty"] = set()
+        try:
+            with timed("monitor_cycle_seconds", kind="dashboard"):
+                await write_dashboard(force, full, dirty)
+        except Exception as e:
+            print("Dashboard update failed:", e)
+
+ALERT_ICONS = {"up": "🟢", "down": "🔴", "maintenance": "🟡"}
+
+def queue_alert(event):
+    if not ADMIN_ID or ALERT_BATCH_WINDOW <= 0:
+        return
+    pending = transitions["pending"]
+    first = pending.pop(event["id"], None)
+    if first is not None:
+        event = {**event, "from": first["from"]}
+    # A target that flaps back within the window cancels out instead of alerting twice
+    if event["from"] != event["to"]:
+        pending[event["id"]] = event
+    if transitions["wake"] is not None:
+        transitions["wake"].set()
+
+def alert_messages(events):
+    groups = {}
+    for e in events:
+        groups.setdefault((e["from"], e["to"]), []).append(e["name"])
+    header = f"<b>🚨 {len(events)} status change{'s' if len(events) != 1 else ''}</b>"
+    lines = []
+    for (old, new), names in sorted(groups.items(), key=lambda g: (g[0][1] != "down", g[0])):
+        lines.append("")
+        lines.append(f"{ALERT_ICONS[new]} <b>{old} → {new}</b> ({len(names)})")
+        lines.extend(f"• {escape(name)}" for name in sorted(names))
+    # Telegram caps messages at 4096 characters, so a long digest continues in follow-up messages
+    messages = []
+    text = header
+    for line in lines:
+        if len(text) + len(line) + 1 > ALERT_MAX_CHARS:
+            messages.append(text)
+            text = f"{header} (cont.)"
+        text += "\n" + line
+    messages.append(text)
+    return messages
+
+async def send_alert(text):
+    for _ in range(3):
+        await edit_limiter.acquire()
+        try:
+            await app.send_message(ADMIN_ID, text, parse_mode=enums.ParseMode.HTML)
+            metric_inc("monitor_alerts_total", result="ok")
+            return True
+        except FloodWait as e:
+            metric_inc("monitor_alerts_total", result="flood_wait")
+            print(f"Flood wait of {e.value}s on admin alert")
+            edit_limiter.pause(e.value)
+        except Exception as e:
+            metric_inc("monitor_alerts_total", result="error")
+            print("Sending alert failed:", e)
+            return False
+    return False
+
+async def alert_sender():
+    transitions["wake"] = wake = asyncio.Event()
+    if transitions["pending"]:
+        wake.set()
+    while True:
+        await wake.wait()
+        # Everything that changes within the window goes out as one digest
+        await asyncio.sleep(ALERT_BATCH_WINDOW)
+        wake.clear()
+        events = list(transitions["pending"].values())
+        transitions["pending"] = {}
+        if not events:
+            continue
+        for text in alert_messages(events):
+            await send_alert(text)
+
+async def transition_consumer():
+    transitions["queue"] = queue = asyncio.Queue(TRANSITION_QUEUE_SIZE)
+    while True:
+        events = [await queue.get()]
+        while not queue.empty():
+            events.append(queue.get_nowait())
+        try:
+            message_ids = (await get_config()).get("message_ids")
+        except Exception as e:
+            print("Loading dashboard messages failed:", e)
+            message_ids = None
+        touched = set()
+        for event in events:
+            # Only the messages holding these targets are re-rendered, and only their lines are rebuilt
+            dashboard["fragments"].pop(event["id"], None)
+            if message_ids:
+                touched.add(message_ids[dashboard_shard(event["id"], len(message_ids))])
+            queue_alert(event)
+        request_dashboard_refresh(message_ids=touched)
+
+def record_probe(result):
+    queue = history["queue"]
+    if queue is None or result["maintenance"]:
+        return
+    try:
+        queue.put_nowait(result)
+    except asyncio.QueueFull:
+        # Never let history writes back-pressure the probe path
+        history["dropped"] += 1
+        metric_inc("monitor_history_dropped_total")
+
+def rollup_updates(results):
+    # Results of one batch are merged per rollup document so each gets a single upsert
+    incs = {}
+    for r in results:
+        ts = int(r["checked_at"])
+        alive = r.get("raw_alive", r["alive"])
+        bucket = bisect_left(LATENCY_BUCKETS, r["elapsed"]) if alive and r["elapsed"] is not None else None
+        for g, (width, _) in ROLLUP_GRANULARITIES.items():
+            start = ts - ts % width
+            key = (r["id"], g, start)
+            inc = incs.get(key)
+            if inc is None:
+                inc = incs[key] = {"total": 0, "up": 0}
+            inc["total"] += 1
+            if alive:
+                inc["up"] += 1
+            if bucket is not None:
+                inc[f"b.{bucket}"] = inc.get(f"b.{bucket}", 0) + 1
+                inc["lat_sum"] = inc.get("lat_sum", 0) + r["elapsed"]
+    updates = []
+    for (target_id, g, start), inc in incs.items():
+        start_dt = datetime.fromtimestamp(start, timezone.utc)
+        keep = ROLLUP_GRANULARITIES[g][1]
+        updates.append(UpdateOne(
+            {"_id": f"{target_id}:{g}:{start}"},
+            {"$inc": inc, "$setOnInsert": {"target": target_id, "g": g, "start": start_dt, "expires": start_dt + keep}},
+            upsert=True
+        ))
+    return updates
+
+async def flush_history(results):
+    docs = [
+        {
+            "target": r["id"],
+            "ts": datetime.fromtimestamp(r["checked_at"], timezone.utc),
+            "alive": r.get("raw_alive", r["alive"]),
+            "status": r["status"],
+            "elapsed": r["elapsed"]
+        }
+        for r in results
+    ]
+    await history_col.insert_many(docs, ordered=False)
+    await rollups_col.bulk_write(rollup_updates(results), ordered=False)
+
+async def history_writer():
+    history["queue"] = queue = asyncio.Queue(maxsize=HISTORY_QUEUE_SIZE)
     try:
-        async with session.get(url, timeout=timeout) as r:
-            elapsed = round((time.time() - start_time) * 1000)
-            if r.status == 200:
-                return f"╭⎋ {name}  \n╰⊚ ᴀʟɪᴠᴇ  🟢 ({elapsed}ms)"
-            return f"╭⎋ {name}  \n╰⊚ Not working 🔴 ({r.status})"
+        await history_col.create_index("ts", expireAfterSeconds=HISTORY_RETENTION_DAYS * 86400)
+        await history_col.create_index([("target", 1), ("ts", -1)])
+        await rollups_col.create_index("expires", expireAfterSeconds=0)
+        await rollups_col.create_index([("g", 1), ("start", 1)])
     except Exception as e:
-        return f"╭⎋ {name}  \n╰⊚ Not working 🔴 (Error)"
+        print("History index setup failed:", e)
+    while True:
+        batch = [await queue.get()]
+        end = time.monotonic() + HISTORY_FLUSH_INTERVAL
+        while len(batch) < HISTORY_BATCH_SIZE:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        try:
+            with timed("monitor_mongo_seconds", op="flush_history"):
+                await flush_history(batch)
+        except Exception as e:
+            print(f"History write of {len(batch)} results failed:", e)
 
-async def updater():
-    async with aiohttp.ClientSession() as session:
+def histogram_percentile(buckets, total, q):
+    rank = q * total
+    seen = 0
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        seen += buckets.get(str(i), 0)
+        if seen >= rank:
+            return bound
+    return LATENCY_BUCKETS[-1]
+
+async def load_rollup_summary():
+    # Today's day rollups: one indexed document per target
+    now = int(time.time())
+    today = datetime.fromtimestamp(now - now % 86400, timezone.utc)
+    summary = {}
+    async for doc in rollups_col.find({"g": "d", "start": today}):
+        buckets = doc.get("b", {})
+        latency_total = sum(buckets.values())
+        summary[doc["target"]] = {
+            "uptime": round(100 * doc["up"] / doc["total"], 2) if doc["total"] else None,
+            "p50": histogram_percentile(buckets, latency_total, 0.50) if latency_total else None,
+            "p95": histogram_percentile(buckets, latency_total, 0.95) if latency_total else None,
+            "p99": histogram_percentile(buckets, latency_total, 0.99) if latency_total else None
+        }
+    history["summary"] = summary
+    probe_state["version"] += 1
+
+async def rollup_refresher():
+    while True:
+        try:
+            await load_rollup_summary()
+        except Exception as e:
+            print("Rollup refresh failed:", e)
+        await asyncio.sleep(ROLLUP_REFRESH_INTERVAL)
+
+def format_summary(target_id):
+    stats = history["summary"].get(target_id)
+    if not stats or stats["uptime"] is None:
+        return ""
+    if stats["p95"] is None:
+        return f"{stats['uptime']}%"
+    return f"{stats['uptime']}% / p95 {stats['p95']}ms"
+
+def emit_transition(prev, result):
+    queue = transitions["queue"]
+    if queue is None:
+        return
+    event = {
+        "id": result["id"],
+        "name": result["name"],
+        "from": target_state(prev),
+        "to": target_state(result),
+        "at": result["checked_at"]
+    }
+    try:
+        queue.put_nowait(event)
+        metric_inc("monitor_transitions_total", to=event["to"])
+    except asyncio.QueueFull:
+        transitions["dropped"] += 1
+        metric_inc("monitor_transitions_dropped_total")
+
+def store_result(result):
+    prev = probe_results.get(result["id"])
+    probe_results[result["id"]] = result
+    probe_state["version"] += 1
+    end_warm_start()
+    broadcast_change(result)
+    if prev is not None and target_state(prev) != target_state(result):
+        emit_transition(prev, result)
+
+def publish_result(result):
+    prev = probe_results.get(result["id"])
+    if prev is not None and prev["alive"] == result["alive"] and prev["maintenance"] == result["maintenance"]:
+        result["changed_at"] = prev.get("changed_at", prev["checked_at"])
+    else:
+        result["changed_at"] = result["checked_at"]
+    store_result(result)
+    record_probe(result)
+    if SHARDED:
+        sharding["pending"][result["id"]] = result
+
+def target_timing(bot):
+    interval = bot.get("interval") or schedule["default_interval"]
+    jitter = bot.get("jitter")
+    if jitter is None:
+        jitter = interval * DEFAULT_JITTER
+    return interval, min(jitter, interval / 2)
+
+def partition_of(target_id):
+    return zlib.crc32(target_id.encode()) % PARTITIONS
+
+def owns(target_id):
+    if not SHARDED:
+        return True
+    # Stop probing as soon as our leases may have lapsed, even if Mongo is unreachable
+    return time.time() < sharding["valid_until"] and partition_of(target_id) in sharding["owned"]
+
+def reschedule(bot, spread=False):
+    target_id = str(bot["_id"])
+    if target_id not in schedule["targets"] or not owns(target_id):
+        schedule["due"].pop(target_id, None)
+        return
+    interval, jitter = target_timing(bot)
+    now = time.monotonic()
+    if spread:
+        # Random phase so targets probed together drift apart instead of firing in lockstep
+        due = now + random.uniform(0, interval)
+    else:
+        due = now + interval + random.uniform(-jitter, jitter)
+    schedule["due"][target_id] = due
+    schedule["timing"][target_id] = (interval, jitter)
+    heapq.heappush(schedule["heap"], (due, target_id))
+    if schedule["wake"] is not None:
+        schedule["wake"].set()
+
+async def sync_schedule():
+    schedule["dirty"] = False
+    config = await get_config()
+    schedule["default_interval"] = config.get("update_interval", 60)
+    update_probe_keepalive()
+    targets = dict(await get_targets())
+    removed = set(schedule["targets"]) - set(targets)
+    if removed:
+        drop_target_metrics(removed)
+    for stale in removed:
+        schedule["due"].pop(stale, None)
+        schedule["timing"].pop(stale, None)
+        probe_results.pop(stale, None)
+        dashboard["fragments"].pop(stale, None)
+        probe_state["version"] += 1
+    schedule["targets"] = targets
+    schedule["synced"] = True
+    for target_id in [i for i in schedule["due"] if not owns(i)]:
+        del schedule["due"][target_id]
+    for target_id, bot in targets.items():
+        if not owns(target_id):
+            continue
+        if target_id not in schedule["due"]:
+            reschedule(bot, spread=True)
+        elif schedule["due"][target_id] is not None and schedule["timing"].get(target_id) != target_timing(bot):
+            # Interval edits apply now rather than after the old interval runs out; in-flight probes pick them up when they finish
+            reschedule(bot)
+
+def probe_soon(target_id):
+    # Moves a target to the front of the schedule, e.g. so a maintenance toggle shows up without waiting an interval
+    if schedule["due"].get(target_id) is None:
+        return
+    now = time.monotonic()
+    schedule["due"][target_id] = now
+    heapq.heappush(schedule["heap"], (now, target_id))
+    if schedule["wake"] is not None:
+        schedule["wake"].set()
+
+def current_results():
+    if not schedule["synced"]:
+        # Target list not loaded yet, e.g. Mongo down at boot: show what the snapshot restored
+        return list(probe_results.values())
+    return [probe_results[i] for i in schedule["targets"] if i in probe_results]
+
+async def probe_targets(bots, spread=False):
+    done = set()
+    try:
+        async for result in probe_many(get_probe_session(), bots):
+            target = schedule["targets"].get(result["id"])
+            done.add(result["id"])
+            if target is None:
+                continue
+            # A probe cut off by the cycle deadline says nothing about the target, so its last result stands
+            if result["error"] != "deadline":
+                publish_result(damp_flaps(result))
+            reschedule(target, spread)
+    finally:
+        for bot in bots:
+            if str(bot["_id"]) not in done:
+                reschedule(bot, spread)
+    probe_state["updated_at"] = time.time()
+
+async def probe_due(bots):
+    try:
+        with timed("monitor_cycle_seconds", kind="scheduled"):
+            await probe_targets(bots)
+    except Exception as e:
+        print("Scheduled probe failed:", e)
+
+async def scheduler():
+    schedule["wake"] = wake = asyncio.Event()
+    last_sync = 0
+    while True:
+        if schedule["dirty"] or time.monotonic() - last_sync >= SCHEDULE_SYNC_INTERVAL:
+            try:
+                await sync_schedule()
+            except Exception as e:
+                print("Schedule sync failed:", e)
+            last_sync = time.monotonic()
+        
+        now = time.monotonic()
+        heap = schedule["heap"]
+        batch = []
+        while heap and heap[0][0] <= now:
+            due, target_id = heapq.heappop(heap)
+            # Entries superseded by a later reschedule or a deleted target are skipped
+            if schedule["due"].get(target_id) == due:
+                schedule["due"][target_id] = None
+                batch.append(schedule["targets"][target_id])
+        if batch:
+            asyncio.create_task(probe_due(batch))
+        
+        delay = SCHEDULE_SYNC_INTERVAL - (now - last_sync)
+        if heap:
+            delay = min(delay, heap[0][0] - now)
+        wake.clear()
+        try:
+            await asyncio.wait_for(wake.wait(), timeout=max(delay, 0.05))
+        except asyncio.TimeoutError:
+            pass
+
+async def lease_manager():
+    try:
+        await workers_col.create_index("expires", expireAfterSeconds=0)
+        await results_col.create_index("updated")
+    except Exception as e:
+        print("Lease index setup failed:", e)
+    try:
         while True:
-            config = await get_config()
-            interval = config.get("update_interval", 60)
-            channel_id = config.get("channel_id")
-            message_id = config.get("message_id")
-            timeout = interval
-            
-            bots = await bots_col.find().to_list(length=100)
-            if not bots:
-                text = "<blockquote>❤️ᴏғғɪᴄɪᴧʟ ʙσᴛs:\n\nNo URLs configured.</blockquote>"
-            else:
-                tasks = [check_service(session, b["name"], b["url"], timeout, b.get("maintenance", False)) for b in bots]
-                results = await asyncio.gather(*tasks)
-                content = "\n\n".join(results)
-                text = f"<blockquote>❤️ᴏғғɪᴄɪᴧʟ ʙσᴛs:\n\n{content}</blockquote>"
-            
-            ist = timezone(timedelta(hours=5, minutes=30))
-            now_ist = datetime.now(ist).strftime('%H:%M:%S')
-            text += f"\n\nLast update: {now_ist}"
             try:
-                if channel_id and message_id:
-                    await app.edit_message_text(channel_id, message_id, text, parse_mode=enums.ParseMode.HTML)
+                await renew_leases()
             except Exception as e:
-                print("Update failed:", e)
-            
-            await asyncio.sleep(interval)
+                print("Lease renewal failed:", e)
+            await asyncio.sleep(LEASE_TTL / 3)
+    finally:
+        sharding["owned"] = set()
+        await leases_col.update_many({"owner": WORKER_ID}, {"$set": {"expires": datetime.now(timezone.utc)}})
 
-async def health_check(request):
-    bots = await bots_col.find().to_list(length=100)
-    config = await get_config()
-    timeout = config.get("update_interval", 60)
+async def renew_leases():
+    now = datetime.now(timezone.utc)
+    expires = now + timedelta(seconds=LEASE_TTL)
+    await workers_col.update_one({"_id": WORKER_ID}, {"$set": {"expires": expires}}, upsert=True)
+    live = await workers_col.count_documents({"expires": {"$gt": now}})
+    share = math.ceil(PARTITIONS / max(live, 1))
+    
+    await leases_col.update_many({"owner": WORKER_ID}, {"$set": {"expires": expires}})
+    leases = {doc["_id"]: doc async for doc in leases_col.find()}
+    owned = {p for p, doc in leases.items() if doc["owner"] == WORKER_ID}
+    
+    if len(owned) > share:
+        # A worker joined: hand back the surplus so it can pick it up
+        surplus = sorted(owned)[share:]
+        await leases_col.update_many({"_id": {"$in": surplus}, "owner": WORKER_ID}, {"$set": {"expires": now}})
+        owned -= set(surplus)
+    elif len(owned) < share:
+        # Free partitions and those whose owner stopped heartbeating
+        free = [p for p in range(PARTITIONS) if p not in leases or leases[p]["expires"].replace(tzinfo=timezone.utc) <= now]
+        random.shuffle(free)
+        for p in free[:share - len(owned)]:
+            try:
+                await leases_col.find_one_and_update(
+                    {"_id": p, "$or": [{"owner": WORKER_ID}, {"expires": {"$lte": now}}]},
+                    {"$set": {"owner": WORKER_ID, "expires": expires}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # Someone else took it between our read and the update
+                continue
+            owned.add(p)
     
-    html = """
+    if owned != sharding["owned"]:
+        print(f"Worker {WORKER_ID} owns {len(owned)}/{PARTITIONS} partitions")
+        mark_schedule_dirty()
+    sharding["owned"] = owned
+    # Stop trusting the leases a little before the expiry other workers see in Mongo, not LEASE_TTL after these round trips
+    sharding["valid_until"] = expires.timestamp() - LEASE_MARGIN
+    metric_set("monitor_partitions_owned", len(owned))
+
+async def result_publisher():
+    while True:
+        await asyncio.sleep(RESULT_SYNC_INTERVAL)
+        pending = sharding["pending"]
+        if not pending:
+            continue
+        sharding["pending"] = {}
+        ops = [
+            UpdateOne(
+                {"_id": target_id},
+                {"$set": {"result": result, "worker": WORKER_ID}, "$currentDate": {"updated": True}},
+                upsert=True
+            )
+            for target_id, result in pending.items()
+        ]
+        try:
+            with timed("monitor_mongo_seconds", op="publish_results"):
+                await results_col.bulk_write(ops, ordered=False)
+        except Exception as e:
+            print(f"Publishing {len(ops)} results failed:", e)
+
+async def result_merger():
+    # Pulls results probed by other workers into the shared store for the dashboard and web pages
+    last = None
+    while True:
+        await asyncio.sleep(RESULT_SYNC_INTERVAL)
+        query = {"updated": {"$gte": last}} if last else {}
+        try:
+            with timed("monitor_mongo_seconds", op="merge_results"):
+                async for doc in results_col.find(query).sort("updated", 1):
+                    last = doc["updated"]
+                    result = doc["result"]
+                    if owns(result["id"]) or result["id"] not in schedule["targets"]:
+                        continue
+                    current = probe_results.get(result["id"])
+                    if current is None or result["checked_at"] > current["checked_at"]:
+                        store_result(result)
+                        probe_state["updated_at"] = time.time()
+        except Exception as e:
+            print("Merging results failed:", e)
+
+async def _refresh_results():
+    try:
+        with timed("monitor_cycle_seconds", kind="full"):
+            await sync_schedule()
+            await probe_targets([b for i, b in schedule["targets"].items() if owns(i)], spread=True)
+    finally:
+        # Even if this first cycle fails, the scheduler takes over and no reader would ever retry it
+        end_warm_start()
+
+def end_warm_start():
+    if probe_state["warm"]:
+        probe_state["warm"] = False
+        probe_state["version"] += 1
+        request_dashboard_refresh()
+
+def start_refresh():
+    # Single-flight: concurrent callers share the refresh that is already running
+    task = probe_state["task"]
+    if task is None or task.done():
+        task = asyncio.create_task(_refresh_results())
+        probe_state["task"] = task
+    return task
+
+async def refresh_results():
+    await asyncio.shield(start_refresh())
+
+async def get_results(max_age=STATUS_MAX_AGE):
+    if schedule["wake"] is not None:
+        # The scheduler keeps every target fresh on its own cadence; readers serve what it produced
+        return probe_results
+    if time.time() - probe_state["updated_at"] > max_age:
+        if probe_state["warm"]:
+            # Restored snapshot: serve it now and let the live cycle finish in the background
+            start_refresh()
+        else:
+            await refresh_results()
+    return probe_results
+
+def read_snapshot_file():
+    with open(SNAPSHOT_FILE) as f:
+        return json.load(f)
+
+def write_snapshot_file(snapshot):
+    tmp = f"{SNAPSHOT_FILE}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, SNAPSHOT_FILE)
+
+async def save_snapshot():
+    results = current_results()
+    if not results:
+        # Nothing probed or restored (e.g. the target list never loaded): keep the snapshot we have
+        return
+    snapshot = {"saved_at": probe_state["updated_at"], "results": results}
+    with timed("monitor_mongo_seconds", op="save_snapshot"):
+        if SNAPSHOT_FILE:
+            await asyncio.to_thread(write_snapshot_file, snapshot)
+        else:
+            await snapshots_col.replace_one({"_id": "latest"}, snapshot, upsert=True)
+
+async def load_snapshot():
+    try:
+        if SNAPSHOT_FILE:
+            snapshot = await asyncio.to_thread(read_snapshot_file)
+        else:
+            snapshot = await snapshots_col.find_one({"_id": "latest"})
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        print("Loading snapshot failed:", e)
+        return
+    if not snapshot or not snapshot.get("results"):
+        return
+    for result in snapshot["results"]:
+        result["stale"] = True
+        probe_results[result["id"]] = result
+        # Continue flap damping from the last known state instead of trusting the first live probe
+        flaps[result["id"]] = {"state": result["alive"], "count": 0}
+    probe_state["updated_at"] = snapshot["saved_at"]
+    probe_state["version"] += 1
+    probe_state["warm"] = True
+    print(f"Restored {len(snapshot['results'])} results from snapshot")
+
+async def snapshot_saver():
+    saved = probe_state["version"]
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        if probe_state["version"] == saved or probe_state["warm"]:
+            continue
+        saved = probe_state["version"]
+        try:
+            await save_snapshot()
+        except Exception as e:
+            print("Saving snapshot failed:", e)
+
+async def updater():
+    # Only renders the dashboard; probing runs on each target's own cadence in scheduler()
+    while True:
+        config = await get_config()
+        interval = config.get("update_interval", 60)
+        request_dashboard_refresh()
+        await asyncio.sleep(interval)
+
+STATUS_PAGE_HEAD = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -385,6 +1817,7 @@ async def health_check(request):
             .status-dead { background: #450a0a; color: #f87171; }
             .status-maint { background: #451a03; color: #fbbf24; }
             .url { color: #94a3b8; font-size: 0.85em; margin-top: 5px; word-break: break-all; }
+            .url:empty { display: none; }
             .footer { margin-top: 20px; font-size: 0.8em; color: #64748b; text-align: center; }
         </style>
     </head>
@@ -392,52 +1825,330 @@ async def health_check(request):
         <div class="container">
             <h1>❤️ᴏғғɪᴄɪᴧʟ ʙσᴛs Status</h1>
     """
-    
-    async with aiohttp.ClientSession() as session:
-        for bot in bots:
-            if bot.get("maintenance", False):
-                status_class = "maint"
-                status_text = "Maintenance 🟡"
-                status_label = "status-maint"
-            else:
-                is_alive = await check_service_simple(session, bot["url"], timeout)
-                status_class = "alive" if is_alive else "dead"
-                status_text = "Alive 🟢" if is_alive else "Down 🔴"
-                status_label = "status-alive" if is_alive else "status-dead"
-            
-            html += f"""
-            <div class="service-card {status_class}">
-                <div class="header">
-                    <span class="name">{bot['name']}</span>
-                    <span class="status {status_label}">{status_text}</span>
-                </div>
+
+STATUS_LABELS = {
+    "up": ("alive", "Alive 🟢"),
+    "down": ("dead", "Down 🔴"),
+    "maintenance": ("maint", "Maintenance 🟡")
+}
+
+# Patches the cards in place from /events instead of reloading the page
+STATUS_PAGE_SCRIPT = """
+    <script>
+        const labels = %s;
+        function apply(t) {
+            const card = document.getElementById("t-" + t.id);
+            if (!card) return;
+            const [cls, text] = labels[t.state];
+            card.className = "service-card " + cls;
+            const status = card.querySelector(".status");
+            status.className = "status status-" + cls;
+            status.textContent = text;
+            card.querySelector(".url").textContent = t.summary;
+        }
+        const events = new EventSource("/events");
+        events.addEventListener("target", e => apply(JSON.parse(e.data)));
+        events.addEventListener("snapshot", e => JSON.parse(e.data).targets.forEach(apply));
+    </script>
+    """ % json.dumps(STATUS_LABELS, ensure_ascii=False)
+
+def target_state(result):
+    if result["maintenance"]:
+        return "maintenance"
+    return "up" if result["alive"] else "down"
+
+def card_summary(result):
+    summary = format_summary(result["id"])
+    if result.get("stale"):
+        summary = f"{summary} · last known" if summary else "last known"
+    return summary
+
+def render_status_card(result):
+    status_class, status_text = STATUS_LABELS[target_state(result)]
+    return f"""
+        <div class="service-card {status_class}" id="t-{escape(result['id'])}">
+            <div class="header">
+                <span class="name">{escape(result['name'])}</span>
+                <span class="status status-{status_class}">{status_text}</span>
             </div>
-            """
-    
-    ist = timezone(timedelta(hours=5, minutes=30))
-    now_ist = datetime.now(ist).strftime('%Y-%m-%d %H:%M:%S')
-    html += f"""
+            <div class="url">{card_summary(result)}</div>
+        </div>
+        """
+
+def render_status_page(cards, updated_at, warm):
+    now_ist = datetime.fromtimestamp(updated_at, IST).strftime('%Y-%m-%d %H:%M:%S')
+    parts = [STATUS_PAGE_HEAD]
+    parts.extend(cards)
+    restored = "<br>Showing last known status, live checks in progress" if warm else ""
+    parts.append(f"""
             <div class="footer">
-                Last update: {now_ist} IST<br>
+                Last update: {now_ist} IST{restored}<br>
                 Monitoring bot for @username
             </div>
         </div>
+    {STATUS_PAGE_SCRIPT}
     </body>
     </html>
-    """
-    return web.Response(text=html, content_type='text/html')
+    """)
+    return "".join(parts)
+
+def status_json(result):
+    return {
+        "id": result["id"],
+        "name": result["name"],
+        "state": target_state(result),
+        "http_status": result["status"],
+        "latency_ms": result["elapsed"],
+        "checked_at": datetime.fromtimestamp(result["checked_at"], timezone.utc).isoformat(),
+        "changed_at": datetime.fromtimestamp(result.get("changed_at", result["checked_at"]), timezone.utc).isoformat(),
+        "stale": result.get("stale", False),
+        "today": history["summary"].get(result["id"]),
+        "summary": card_summary(result)
+    }
+
+def broadcast_change(result):
+    # Only what a status card shows counts as a change; latency jitter is not pushed
+    key = (result["name"], target_state(result), card_summary(result))
+    if live["last"].get(result["id"]) == key:
+        return
+    live["last"][result["id"]] = key
+    if not live["subscribers"]:
+        return
+    message = f"event: target\ndata: {json.dumps(status_json(result), ensure_ascii=False)}\n\n".encode()
+    for queue in list(live["subscribers"]):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop it, the browser reconnects and gets a fresh snapshot
+            live["subscribers"].discard(queue)
+
+async def events_handler(request):
+    if len(live["subscribers"]) >= SSE_MAX_CLIENTS:
+        raise web.HTTPServiceUnavailable(headers={"Retry-After": "30"})
+    await get_results()
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    await response.prepare(request)
+    queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+    # Subscribe before taking the snapshot so no change can fall between the two
+    live["subscribers"].add(queue)
+    metric_set("monitor_sse_clients", len(live["subscribers"]))
+    try:
+        await response.write(b"event: snapshot\ndata: " + status_snapshot() + b"\n\n")
+        while queue in live["subscribers"]:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                message = b": ping\n\n"
+            await response.write(message)
+    except ConnectionResetError:
+        pass
+    finally:
+        live["subscribers"].discard(queue)
+        metric_set("monitor_sse_clients", len(live["subscribers"]))
+    return response
+
+def make_body(body, content_type):
+    digest = hashlib.sha1(body).hexdigest()
+    return {
+        "body": body,
+        "gzip": gzip.compress(body, 6),
+        "etag": f'"{digest}"',
+        # A strong ETag identifies one representation, so the compressed variant gets its own
+        "gzip_etag": f'"{digest}-gz"',
+        "content_type": content_type
+    }
+
+def target_body(result):
+    # A target's card and JSON are only re-rendered when its result or today's figures change
+    today = history["summary"].get(result["id"])
+    cached = status_cache["targets"].get(result["id"])
+    if cached is None or cached["result"] is not result or cached["today"] != today:
+        cached = status_cache["targets"][result["id"]] = {
+            "result": result,
+            "today": today,
+            "card": render_status_card(result),
+            "json": json.dumps(status_json(result), ensure_ascii=False).encode(),
+            "entry": None
+        }
+    return cached
+
+def target_status_body(target_id):
+    result = probe_results.get(target_id)
+    if result is None or (schedule["synced"] and target_id not in schedule["targets"]):
+        return None
+    cached = target_body(result)
+    if cached["entry"] is None:
+        cached["entry"] = make_body(cached["json"], "application/json")
+    return cached["entry"]
+
+def status_document(fragments, updated_at, warm):
+    head = json.dumps({
+        "updated_at": datetime.fromtimestamp(updated_at, timezone.utc).isoformat(),
+        "stale": warm
+    }, ensure_ascii=False)[:-1].encode()
+    return head + b', "targets": [' + b", ".join(fragments) + b"]}"
+
+def status_snapshot():
+    # Built from the live results rather than the throttled /api/status body, which may predate deltas already broadcast
+    fragments = [target_body(r)["json"] for r in current_results()]
+    return status_document(fragments, probe_state["updated_at"] or time.time(), probe_state["warm"])
+
+def render_status_bodies(cards, fragments, updated_at, warm):
+    # Runs in a worker thread: joining and compressing the full page and JSON are the expensive part
+    return {
+        "/": make_body(render_status_page(cards, updated_at, warm).encode(), "text/html"),
+        "/api/status": make_body(status_document(fragments, updated_at, warm), "application/json")
+    }
+
+async def rebuild_status_bodies():
+    try:
+        version = probe_state["version"]
+        targets = [target_body(r) for r in current_results()]
+        live_ids = {t["result"]["id"] for t in targets}
+        for target_id in [i for i in status_cache["targets"] if i not in live_ids]:
+            del status_cache["targets"][target_id]
+        status_cache["bodies"] = await asyncio.to_thread(
+            render_status_bodies,
+            [t["card"] for t in targets],
+            [t["json"] for t in targets],
+            probe_state["updated_at"] or time.time(),
+            probe_state["warm"]
+        )
+        status_cache["version"] = version
+        status_cache["built_at"] = time.monotonic()
+    finally:
+        status_cache["task"] = None
+
+async def status_body(key):
+    if key.startswith("/api/status/"):
+        return target_status_body(key[len("/api/status/"):])
+    if status_cache["version"] != probe_state["version"] and time.monotonic() - status_cache["built_at"] >= STATUS_RENDER_INTERVAL:
+        # Concurrent requests share one rebuild; shield it so a client hanging up does not cancel it for the others
+        if status_cache["task"] is None:
+            status_cache["task"] = asyncio.create_task(rebuild_status_bodies())
+        await asyncio.shield(status_cache["task"])
+    return status_cache["bodies"].get(key)
+
+def accepts_gzip(header):
+    # q-values count, so "gzip;q=0" opts out; x-gzip is the legacy name and "*" covers codings not listed
+    gzip_q = wildcard_q = None
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            gzip_q = max(gzip_q or 0.0, q)
+        elif coding == "*":
+            wildcard_q = q
+    if gzip_q is None:
+        gzip_q = wildcard_q
+    return gzip_q is not None and gzip_q > 0
+
+async def serve_status(request, key):
+    entry = await status_body(key)
+    if entry is None:
+        raise web.HTTPNotFound()
+    if accepts_gzip(request.headers.get("Accept-Encoding", "")):
+        body, etag = entry["gzip"], entry["gzip_etag"]
+        headers = {"Content-Encoding": "gzip"}
+    else:
+        body, etag = entry["body"], entry["etag"]
+        headers = {}
+    headers.update({"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"})
+    if_none_match = request.headers.get("If-None-Match", "")
+    if if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(",")):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, headers=headers, content_type=entry["content_type"], charset="utf-8")
+
+async def health_check(request):
+    await get_results()
+    return await serve_status(request, "/")
+
+async def api_status(request):
+    await get_results()
+    return await serve_status(request, "/api/status")
+
+async def api_target_status(request):
+    await get_results()
+    return await serve_status(request, f"/api/status/{request.match_info['target_id']}")
+
+async def run_worker():
+    # Probe-only process: no Telegram client, only /metrics on the web port
+    server = web.Application()
+    server.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", WEB_PORT).start()
+    
+    probe_transport["session"] = create_probe_session()
+    try:
+        await asyncio.gather(
+            loop_monitor(),
+            watch_cache(),
+            lease_manager(),
+            result_publisher(),
+            scheduler(),
+            history_writer()
+        )
+    finally:
+        await probe_transport["session"].close()
+        await runner.cleanup()
 
 async def main():
+    if RUN_MODE == "worker":
+        await run_worker()
+        return
+    
+    # Restore the last snapshot before serving so restarts never show an empty page
+    await load_snapshot()
+    try:
+        await sync_schedule()
+    except Exception as e:
+        print("Initial target load failed:", e)
+    
     server = web.Application()
     server.router.add_get("/", health_check)
+    server.router.add_get("/api/status", api_status)
+    server.router.add_get("/api/status/{target_id}", api_target_status)
+    server.router.add_get("/events", events_handler)
+    server.router.add_get("/metrics", metrics_handler)
     runner = web.AppRunner(server)
     await runner.setup()
-    site = web.TCPSite(runner, "0.0.0.0", 8080)
+    site = web.TCPSite(runner, "0.0.0.0", WEB_PORT)
     asyncio.create_task(site.start())
     
-    async with app:
-        asyncio.create_task(updater())
-        await idle()
+    probe_transport["session"] = create_probe_session()
+    try:
+        async with app:
+            asyncio.create_task(loop_monitor())
+            asyncio.create_task(watch_cache())
+            if SHARDED:
+                asyncio.create_task(lease_manager())
+                asyncio.create_task(result_publisher())
+                asyncio.create_task(result_merger())
+            asyncio.create_task(scheduler())
+            asyncio.create_task(dashboard_writer())
+            asyncio.create_task(transition_consumer())
+            asyncio.create_task(alert_sender())
+            asyncio.create_task(history_writer())
+            asyncio.create_task(rollup_refresher())
+            asyncio.create_task(snapshot_saver())
+            start_refresh()
+            asyncio.create_task(updater())
+            await idle()
+    finally:
+        try:
+            await save_snapshot()
+        except Exception as e:
+            print("Saving snapshot failed:", e)
+        await probe_transport["session"].close()
 
 if __name__ == "__main__":
     app.run(main())